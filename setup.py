@@ -38,6 +38,11 @@ setup(
             "black>=21.0",
             "flake8>=3.9",
         ],
+        "fast": [
+            "pyahocorasick>=2.0",
+            "google-re2>=1.0",
+            "orjson>=3.0",
+        ],
     },
     keywords="language detection, code analysis, programming languages, utility",
     project_urls={
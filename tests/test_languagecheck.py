@@ -1,6 +1,6 @@
 # There is no datafile generation for testblock, all results are shown on terminal itself
 
-from ucheck import languagecheck
+from ucheck import languagecheck, languagecheck_batch
 
 def test_language_detection():    
     test_cases = [
@@ -13,6 +13,15 @@ def hello_world():
 
 if __name__ == "__main__":
     hello_world()
+""",
+            "expected": "py"
+        },
+        {
+            "name": "Python dicts",
+            "code": """
+def language_names() -> dict:
+    names = {"py": "Python", "css": "CSS"}
+    return {code: name.upper() for code, name in names.items()}
 """,
             "expected": "py"
         },
@@ -64,6 +73,39 @@ helloWorld();
 """,
             "expected": "js"
         },
+        {
+            "name": "Go",
+            "code": """
+package main
+
+import "fmt"
+
+func main() {
+    fmt.Println("Hello, World!")
+}
+""",
+            "expected": "go"
+        },
+        {
+            "name": "Python Go tmpl",
+            "code": '''
+import os
+
+TEMPLATE = """
+package main
+"""
+''',
+            "expected": "py"
+        },
+        {
+            "name": "Shell",
+            "code": """#!/bin/bash
+for name in "$@"; do
+    echo "Hello, $name"
+done
+""",
+            "expected": "shell"
+        },
         {
             "name": "Empty string",
             "code": "",
@@ -89,5 +131,28 @@ helloWorld();
     print("\\n" + "="*50)
 
 
+def test_language_detection_batch():
+    texts = [
+        'def add(a, b):\n    return a + b\n',
+        '#include <stdio.h>\nint main() { printf("hi"); }\n',
+        'def add(a, b):\n    return a + b\n',
+        "",
+        "SELECT name FROM users WHERE id = 1",
+    ]
+    
+    print("Testing Batch Language Detection\n" + "="*50)
+    
+    expected = ["py", "c", "py", "unknown", "sql"]
+    result = languagecheck_batch(texts)
+    
+    status = "✓ PASS" if result == expected else "✗ FAIL"
+    print(f"{'Batch':<15} | Expected: {expected} | Got: {result} | {status}")
+    
+    print("\n" + "="*50)
+    
+    assert result == expected
+
+
 if __name__ == "__main__":
-    test_language_detection()
\ No newline at end of file
+    test_language_detection()
+    test_language_detection_batch()
\ No newline at end of file
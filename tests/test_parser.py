@@ -182,6 +182,36 @@ class App:
         nodes = result["analysisData"]["graphNodes"]
         self.assertEqual(len(nodes), 0)
     
+    def test_docstring_and_comment_removal(self):
+        """Test 5: Strip docstrings and comments without touching the code."""
+        test_code = '''
+def with_trailing_comment():
+    """
+    Docstring closed on a commented line.
+    """  # closing comment
+    x = 1
+    return x
+
+def one_liner(): "Docstring on the def line."
+
+class Worker:
+    def run(self):
+        """Run the worker."""  # method comment
+        return "ran"  # inline comment
+'''
+
+        test_file = os.path.join(self.test_dir, "cleaning.py")
+        with open(test_file, 'w') as f:
+            f.write(test_code)
+
+        result = parse_code(test_file, self.output_dir)
+
+        codes = {node["label"]: node["code"] for node in result["analysisData"]["graphNodes"]}
+        self.assertEqual(codes["with_trailing_comment"], 'def with_trailing_comment():\n    x = 1\n    return x')
+        self.assertEqual(codes["one_liner"], 'def one_liner():')
+        # Methods are cleaned from their indented source
+        self.assertEqual(codes["Worker.run"], '    def run(self):\n        return "ran"')
+
     def test_output_file_creation(self):
         """Test that JSON output file is created correctly."""
         test_code = '''
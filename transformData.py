@@ -4,10 +4,11 @@ Data transformation utility for converting various JSON formats to utilityCheck
 Handles missing code fields and normalizes data structure.
 """
 
-import json
 import os
-import glob
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from ucheck.jsonio import load_json, dump_json
 
 def transform_data_file(input_file: str, output_file: str) -> Dict[str, Any]:
     """
@@ -21,8 +22,7 @@ def transform_data_file(input_file: str, output_file: str) -> Dict[str, Any]:
         Dict[str, Any]: Transformation summary
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data: Any = json.load(f)
+        data: Any = load_json(input_file)
         
         graph_nodes: List[Any]
         # Extract graph nodes
@@ -37,11 +37,11 @@ def transform_data_file(input_file: str, output_file: str) -> Dict[str, Any]:
         elif isinstance(data, list):
             graph_nodes = data
         else:
-            print(f"Warning: Unexpected data structure in {input_file}")
-            return {"status": "error", "message": "Unexpected data structure"}
+            # Reported by the caller, so pool threads never write to stdout
+            return {"status": "error", "input_file": input_file, "message": "Unexpected data structure"}
         
-        # Transform nodes
-        transformed_nodes: List[Dict[str, Any]] = []
+        # Transform nodes into a list sized for the input, trimmed once at the end
+        transformed_nodes: List[Any] = [None] * len(graph_nodes)
         skipped_count: int = 0
         transformed_count: int = 0
         
@@ -67,7 +67,7 @@ def transform_data_file(input_file: str, output_file: str) -> Dict[str, Any]:
                 
             # Create standardized node
             transformed_node: Dict[str, Any] = {
-                "id": node.get("id", f"unknown_{len(transformed_nodes)}"),
+                "id": node.get("id", f"unknown_{transformed_count}"),
                 "label": label,
                 "code": code,
                 "language": node.get("language", "py")  # Default to Python
@@ -77,9 +77,11 @@ def transform_data_file(input_file: str, output_file: str) -> Dict[str, Any]:
             if "type" in node:
                 transformed_node["type"] = node["type"]
             
-            transformed_nodes.append(transformed_node)
+            transformed_nodes[transformed_count] = transformed_node
             transformed_count += 1
         
+        del transformed_nodes[transformed_count:]
+        
         # Create output structure
         output_data: Dict[str, Any] = {
             "analysisData": {
@@ -88,8 +90,7 @@ def transform_data_file(input_file: str, output_file: str) -> Dict[str, Any]:
         }
         
         # Write transformed data
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2)
+        dump_json(output_data, output_file)
         
         return {
             "status": "success",
@@ -124,8 +125,17 @@ def transform_directory(input_dir: str, output_dir: Optional[str] = None) -> Dic
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     
-    # Find all JSON files
-    json_files: List[str] = glob.glob(os.path.join(input_dir, "*.json"))
+    # Find all JSON files still to transform in one directory pass, skipping
+    # already processed files (avoid overwriting ranked files) and, like glob,
+    # hidden files
+    with os.scandir(input_dir) as entries:
+        json_files: List[str] = [
+            entry.path for entry in entries
+            if entry.name.endswith(".json")
+            and not entry.name.endswith(("_rank.json", "_transformed.json"))
+            and not entry.name.startswith(".")
+            and entry.is_file()
+        ]
     
     results: Dict[str, Any] = {
         "total_files": len(json_files),
@@ -136,11 +146,8 @@ def transform_directory(input_dir: str, output_dir: Optional[str] = None) -> Dic
         "files": []
     }
     
+    jobs: List[Tuple[str, str]] = []
     for json_file in json_files:
-        # Skip already processed files (avoid overwriting ranked files)
-        if json_file.endswith("_rank.json") or json_file.endswith("_transformed.json"):
-            continue
-        
         # Create output filename
         base_name: str = os.path.splitext(os.path.basename(json_file))[0]
         output_file: str
@@ -148,9 +155,14 @@ def transform_directory(input_dir: str, output_dir: Optional[str] = None) -> Dic
             output_file = os.path.join(output_dir, f"{base_name}_transformed.json")
         else:
             output_file = os.path.join(output_dir, f"{base_name}.json")
-        
-        # Transform file
-        result: Dict[str, Any] = transform_data_file(json_file, output_file)
+        jobs.append((json_file, output_file))
+    
+    # Files are independent and mostly disk I/O, so transform them on a thread
+    # pool; results come back in input order and are reported from this thread
+    with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+        file_results: List[Dict[str, Any]] = list(executor.map(lambda job: transform_data_file(*job), jobs))
+    
+    for (json_file, _), result in zip(jobs, file_results):
         results["files"].append(result)
         
         if result["status"] == "success":
@@ -4,9 +4,9 @@ UtilityCheck Package
 A utility package for various code analysis tasks including language detection.
 """
 
-from .languagecheck.detector import languagecheck
+from .languagecheck.detector import languagecheck, languagecheck_batch
 
 __version__ = "1.0.0"
 __author__ = "UtilityCheck Team"
 
-__all__ = ["languagecheck"]
\ No newline at end of file
+__all__ = ["languagecheck", "languagecheck_batch"]
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+JSON file helpers shared by the parser, the ranker and transformData.py.
+
+Uses orjson when it is installed (see extras_require["fast"]) and the
+standard json module otherwise. Output is always indented by two spaces.
+This module only imports the standard library and orjson, so it can be
+loaded from scripts run outside the package.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional faster JSON codec, see extras_require["fast"]
+    orjson = None
+
+
+def load_json(path: str) -> Any:
+    """Read a JSON file, with orjson straight from bytes when it is installed."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump_json(data: Any, path: str) -> None:
+    """Write data as indented JSON, with orjson when it is installed."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
@@ -1,4 +1,421 @@
+import ast
 import re
+import warnings
+from functools import lru_cache
+from typing import Any, Optional
+
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator, see extras_require["fast"]
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:  # optional linear-time regex engine, see extras_require["fast"]
+    re2 = None
+
+_LANGUAGE_PATTERNS: dict[str, dict[str, list[str]]] = {
+    "py": {
+        "keywords": ["def ", "import ", "from ", "class ", "if __name__", "print(", "elif ", "lambda "],
+        "patterns": [r"def\s+\w+\s*\(", r"import\s+\w+", r"from\s+\w+\s+import", r"#.*", r"print\s*\("]
+    },
+    "java": {
+        "keywords": ["public class", "public static void main", "System.out.println", "import java", "public static", "private ", "protected "],
+        "patterns": [r"public\s+class\s+\w+", r"System\.out\.println", r"public\s+static\s+void\s+main"]
+    },
+    "cpp": {
+        "keywords": ["#include <", "std::", "cout <<", "cin >>", "namespace std", "using namespace", "int main()"],
+        "patterns": [r"#include\s*<\w+>", r"std::\w+", r"cout\s*<<", r"cin\s*>>", r"using\s+namespace\s+std"]
+    },
+    "c": {
+        "keywords": ["#include <stdio.h>", "#include <stdlib.h>", "printf(", "scanf(", "int main()", "void main()"],
+        "patterns": [r"#include\s*<\w+\.h>", r"printf\s*\(", r"scanf\s*\(", r"int\s+main\s*\(\s*\)"]
+    },
+    "js": {
+        "keywords": ["function ", "var ", "let ", "const ", "console.log", "document.", "window.", "=> "],
+        "patterns": [r"function\s+\w+\s*\(", r"console\.log\s*\(", r"document\.\w+", r"=>\s*", r"var\s+\w+\s*="]
+    },
+    "ts": {
+        "keywords": ["interface ", "type ", ": string", ": number", ": boolean", "export ", "import {"],
+        "patterns": [r"interface\s+\w+", r":\s*(string|number|boolean)", r"export\s+(interface|type|class)"]
+    },
+    "go": {
+        "keywords": ["package main", "func main()", "import (", "fmt.Println", "var ", "func "],
+        "patterns": [r"package\s+main", r"func\s+main\s*\(\s*\)", r"fmt\.Println", r"func\s+\w+\s*\("]
+    },
+    "r": {
+        "keywords": ["library(", "<- ", "print(", "cat(", "data.frame(", "c("],
+        "patterns": [r"library\s*\(", r"\w+\s*<-", r"data\.frame\s*\(", r"\bc\s*\("]
+    },
+    "matlab": {
+        "keywords": ["function ", "end", "fprintf(", "disp(", "plot(", "clear all"],
+        "patterns": [r"function\s+\w+", r"fprintf\s*\(", r"disp\s*\(", r"clear\s+all"]
+    },
+    "shell": {
+        "keywords": ["#!/bin/bash", "#!/bin/sh", "echo ", "if [", "for ", "while "],
+        "patterns": [r"#!/bin/(bash|sh)", r"echo\s+", r"if\s*\[", r"\$\w+"]
+    },
+    "sql": {
+        "keywords": ["SELECT ", "FROM ", "WHERE ", "INSERT INTO", "UPDATE ", "DELETE FROM", "CREATE TABLE"],
+        "patterns": [r"SELECT\s+.*\s+FROM", r"INSERT\s+INTO", r"CREATE\s+TABLE", r"UPDATE\s+\w+\s+SET"]
+    },
+    "html": {
+        "keywords": ["<html>", "<head>", "<body>", "<div>", "<!DOCTYPE", "<script>"],
+        "patterns": [r"<!DOCTYPE\s+html>", r"<(html|head|body|div|script)", r"</\w+>"]
+    },
+    "css": {
+        "keywords": ["{", "}", "color:", "background:", "margin:", "padding:"],
+        "patterns": [r"\w+\s*\{[^}]{0,500}\}", r"(color|background|margin|padding)\s*:", r"#[0-9a-fA-F]{3,6}"]
+    }
+}
+
+# How a pattern is matched: plain substring count, "head\\s*tail" scan, or regex.
+_LITERAL = "literal"
+_GAPPED = "gapped"
+_REGEX = "regex"
+
+_REGEX_META = frozenset("[](){}|*+?^$.")
+_WHITESPACE_RUN = re.compile(r"\s*")
+_PATTERN_TOKEN = re.compile(r"\\.|[^\\]+")
+
+
+def _literal_parts(pattern: str) -> Optional[list[str]]:
+    """
+    Split a pattern on ``\\s*`` into lowercased literal pieces.
+    
+    Returns None when any piece needs real regex semantics.
+    """
+    parts: list[str] = []
+    for piece in pattern.split(r"\s*"):
+        literal: list[str] = []
+        i = 0
+        while i < len(piece):
+            char = piece[i]
+            if char == "\\":
+                # Escaped punctuation is literal, escapes like \w or \b are not
+                if i + 1 >= len(piece) or piece[i + 1].isalnum():
+                    return None
+                literal.append(piece[i + 1])
+                i += 2
+            elif char in _REGEX_META:
+                return None
+            else:
+                literal.append(char)
+                i += 1
+        if literal:
+            parts.append("".join(literal).lower())
+    return parts
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """Return True if the pattern has a ``|`` outside every group and class."""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _required_chars(pattern: str) -> frozenset[str]:
+    """
+    Return lowercased characters every match of the pattern must contain.
+    
+    Only the leading literal run is used, which is enough to reject most
+    patterns cheaply; a pattern that starts with a class or group requires nothing.
+    """
+    if _has_top_level_alternation(pattern):
+        return frozenset()
+    
+    required: set[str] = set()
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break
+            char = pattern[i + 1]
+            i += 2
+        elif char in _REGEX_META:
+            break
+        else:
+            i += 1
+        # A quantified character may be absent
+        if i < len(pattern) and pattern[i] in "*?{":
+            break
+        required.add(char.lower())
+    return frozenset(required)
+
+
+def _lower_pattern(pattern: str) -> str:
+    """Lowercase a pattern's literal text, leaving escapes such as ``\\S`` or ``\\W`` untouched."""
+    return _PATTERN_TOKEN.sub(
+        lambda match: match.group() if match.group().startswith("\\") else match.group().lower(),
+        pattern,
+    )
+
+
+def _compile_regex(pattern: str) -> Any:
+    """
+    Compile with RE2 when installed (linear time, no backtracking), else with re.
+    
+    Patterns are matched against lowercased text, so no case folding is needed.
+    """
+    pattern = _lower_pattern(pattern)
+    if re2 is not None:
+        try:
+            return re2.compile(f"(?m){pattern}")
+        except Exception:  # outside RE2's syntax, the backtracking engine still handles it
+            pass
+    return re.compile(pattern, re.MULTILINE)
+
+
+def _compile_pattern(pattern: str) -> tuple[str, Any, frozenset[str]]:
+    """
+    Pick the cheapest matcher that counts exactly what the regex would.
+    
+    The matcher carries the characters any match must contain.
+    """
+    parts = _literal_parts(pattern)
+    if parts is not None and len(parts) == 1:
+        return _LITERAL, parts[0], frozenset(parts[0])
+    if parts is not None and len(parts) == 2:
+        return _GAPPED, (parts[0], parts[1]), frozenset(parts[0] + parts[1])
+    return _REGEX, _compile_regex(pattern), _required_chars(pattern)
+
+
+def _count_gapped(text_lower: str, head: str, tail: str) -> int:
+    """Count non-overlapping ``head\\s*tail`` matches without the regex engine."""
+    count = 0
+    pos = text_lower.find(head)
+    while pos != -1:
+        # The gap is skipped by the C matcher rather than a per-character loop
+        end = _WHITESPACE_RUN.match(text_lower, pos + len(head)).end()
+        if text_lower.startswith(tail, end):
+            count += 1
+            pos = text_lower.find(head, end + len(tail))
+        else:
+            pos = text_lower.find(head, pos + 1)
+    return count
+
+
+# Frozen rule table built once at import: (language, lowercased keywords,
+# pattern matchers). Calls iterate it directly instead of rebuilding the rules.
+_LANG_RULES: tuple[tuple[str, tuple[str, ...], tuple[tuple[str, Any, frozenset[str]], ...]], ...] = tuple(
+    (
+        lang,
+        tuple(keyword.lower() for keyword in rules["keywords"]),
+        tuple(_compile_pattern(pattern) for pattern in rules["patterns"]),
+    )
+    for lang, rules in _LANGUAGE_PATTERNS.items()
+)
+
+# Languages are scored in a flat list indexed by their position in _LANG_RULES
+_LANG_COUNT = len(_LANG_RULES)
+_LANG_IDS: dict[str, int] = {lang: lang_id for lang_id, (lang, _, _) in enumerate(_LANG_RULES)}
+_CPP, _C, _JS, _TS = (_LANG_IDS[lang] for lang in ("cpp", "c", "js", "ts"))
+
+# Keyword -> (language id, weight) it counts for. A few keywords ("var ", "print(",
+# "function ", "int main()") are shared, so each hit may score several languages.
+_KEYWORD_HITS: dict[str, list[tuple[int, int]]] = {}
+for _lang_id, (_, _keywords, _) in enumerate(_LANG_RULES):
+    for _keyword in _keywords:
+        _KEYWORD_HITS.setdefault(_keyword, []).append((_lang_id, 2))
+
+# Keywords and their payloads, both indexed by keyword id
+_KEYWORDS: tuple[str, ...] = tuple(_KEYWORD_HITS)
+_KEYWORD_PAYLOADS: tuple[tuple[tuple[int, int], ...], ...] = tuple(
+    tuple(hits) for hits in _KEYWORD_HITS.values()
+)
+
+# With pyahocorasick installed one automaton covers every language's keywords,
+# so the whole keyword phase is a single pass over the text whatever the
+# number of languages. Each match yields its keyword id.
+_KEYWORD_AUTOMATON = None
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword_id, _keyword in enumerate(_KEYWORDS):
+        _KEYWORD_AUTOMATON.add_word(_keyword, _keyword_id)
+    _KEYWORD_AUTOMATON.make_automaton()
+
+
+# Top-level statements that make a sample that parses as Python count as Python
+_PYTHON_MARKERS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom)
+
+# Characters of input scored; the opening of a file is enough to identify it
+_SAMPLE_SIZE = 4096
+
+# Unambiguous markers that settle the language without scoring. Prefixes are
+# checked against the start of the text, before the Python parse; head markers
+# may appear anywhere near the top, so they only count once the text has
+# failed to parse as Python (where they could sit in a string or comment).
+# "#include <stdio.h>" is left to scoring since C++ sources include it too.
+_SENTINEL_HEAD_SIZE = 200
+_PREFIX_SENTINELS: tuple[tuple[str, str], ...] = (
+    ("#!/bin/bash", "shell"),
+    ("#!/bin/sh", "shell"),
+    ("#!/usr/bin/env bash", "shell"),
+    ("#!/usr/bin/env sh", "shell"),
+    ("#!/usr/bin/env python", "py"),
+    ("#!/usr/bin/python", "py"),
+    ("<!doctype html", "html"),
+)
+_HEAD_SENTINELS: tuple[tuple[str, str], ...] = (
+    ("public static void main", "java"),
+)
+
+
+def _is_go_main(head: str) -> bool:
+    """Return True if the first line past blank lines and comments is Go's ``package main`` clause."""
+    in_comment = False
+    for line in head.split("\n"):
+        line = line.strip()
+        if in_comment:
+            in_comment = "*/" not in line
+        elif line.startswith("/*"):
+            in_comment = "*/" not in line[2:]
+        elif line and not line.startswith("//"):
+            # Go requires the package clause before any other code
+            return line.split("//")[0].split() == ["package", "main"]
+    return False
+
+
+def _prefix_language(head: str) -> Optional[str]:
+    """Return the language for a lowercased head that opens with an unambiguous marker, else None."""
+    for prefix, lang in _PREFIX_SENTINELS:
+        if head.startswith(prefix):
+            return lang
+    if _is_go_main(head):
+        return "go"
+    return None
+
+
+def _head_marker_language(head: str) -> Optional[str]:
+    """Return the language for a lowercased head containing an unambiguous marker, else None."""
+    for marker, lang in _HEAD_SENTINELS:
+        if marker in head:
+            return lang
+    return None
+
+
+def _is_python(sample: str) -> bool:
+    """
+    Return True if the sample parses as Python and defines or imports something.
+    
+    A truncated sample is cut back to its last full line first. Anything
+    that still fails to parse is left to scoring.
+    """
+    if len(sample) >= _SAMPLE_SIZE:
+        sample = sample[:sample.rfind("\n") + 1]
+    try:
+        with warnings.catch_warnings():
+            # Invalid escapes in string literals are not our concern here
+            warnings.simplefilter("ignore")
+            tree = ast.parse(sample)
+    except (SyntaxError, ValueError, RecursionError):
+        return False
+    return any(isinstance(node, _PYTHON_MARKERS) for node in tree.body)
+
+
+def _score_keywords(text_lower: str, scores: list[int]) -> None:
+    """Add keyword points into scores; each keyword counts once however often it appears."""
+    if _KEYWORD_AUTOMATON is not None:
+        found = {keyword_id for _, keyword_id in _KEYWORD_AUTOMATON.iter(text_lower)}
+    else:
+        found = {keyword_id for keyword_id, keyword in enumerate(_KEYWORDS) if keyword in text_lower}
+    
+    for keyword_id in found:
+        for lang_id, weight in _KEYWORD_PAYLOADS[keyword_id]:
+            scores[lang_id] += weight
+
+
+@lru_cache(maxsize=1024)
+def _detect(sample: str) -> str:
+    """
+    Classify a stripped sample of at most _SAMPLE_SIZE characters.
+    
+    Cached so repeated snippets skip scoring; keys stay bounded because
+    languagecheck passes only the sample, never the whole text.
+    """
+    # Cheap disambiguators first: shebangs, doctypes, Go's package clause
+    head = sample[:_SENTINEL_HEAD_SIZE].lower()
+    sentinel = _prefix_language(head)
+    if sentinel is not None:
+        return sentinel
+    
+    # Python is the common case here, and CPython's parser settles it outright
+    if _is_python(sample):
+        return "py"
+    
+    # Entry-point markers, now that they cannot be inside Python strings
+    sentinel = _head_marker_language(head)
+    if sentinel is not None:
+        return sentinel
+    
+    # Only the scoring path needs the full lowercased copy
+    sample_lower = sample.lower()
+    
+    # Score each language based on keyword and pattern matches
+    sample_chars = set(sample_lower)
+    scores = [0] * _LANG_COUNT
+    _score_keywords(sample_lower, scores)
+    
+    for lang_id, (_, _, patterns) in enumerate(_LANG_RULES):
+        score = 0
+        
+        # Check patterns, skipping any whose required characters never occur
+        for kind, matcher, requirements in patterns:
+            if not requirements <= sample_chars:
+                continue
+            if kind == _LITERAL:
+                score += sample_lower.count(matcher)
+            elif kind == _GAPPED:
+                score += _count_gapped(sample_lower, *matcher)
+            else:
+                score += sum(1 for _ in matcher.finditer(sample_lower))
+        
+        scores[lang_id] += score
+    
+    # Special cases and additional heuristics
+    
+    # C++ vs C disambiguation
+    if scores[_CPP] and scores[_C]:
+        if any(keyword in sample_lower for keyword in ["std::", "cout", "cin", "namespace", "using namespace"]):
+            scores[_CPP] += 3
+        else:
+            scores[_C] += 1
+    
+    # JavaScript vs TypeScript disambiguation
+    if scores[_JS] and scores[_TS]:
+        if any(keyword in sample_lower for keyword in ["interface", "type ", ": string", ": number", ": boolean"]):
+            scores[_TS] += 3
+        else:
+            scores[_JS] += 1
+    
+    # Return the language with the highest score, earliest language on ties
+    best_id, best_score = -1, 0
+    for lang_id in range(_LANG_COUNT):
+        if scores[lang_id] > best_score:
+            best_id, best_score = lang_id, scores[lang_id]
+    
+    if best_id >= 0:
+        return _LANG_RULES[best_id][0]
+    
+    return "unknown"
+
 
 def languagecheck(text: str = "") -> str:
     """
@@ -23,110 +440,48 @@ def languagecheck(text: str = "") -> str:
              - "html" for HTML
              - "css" for CSS
              - "unknown" for unrecognized languages
+    
+    Only the first 4 KiB of the stripped text is scored, which keeps the cost
+    flat for large files. Markers that first appear further down are ignored.
+    Results are cached per sample, so repeated snippets are answered at once.
     """
     
-    if not text or not text.strip():
+    text_clean = text.strip() if text else ""
+    if not text_clean:
         return "unknown"
     
-    text_clean = text.strip()
-    text_lower = text_clean.lower()
-    
-    language_patterns = {
-        "py": {
-            "keywords": ["def ", "import ", "from ", "class ", "if __name__", "print(", "elif ", "lambda "],
-            "patterns": [r"def\s+\w+\s*\(", r"import\s+\w+", r"from\s+\w+\s+import", r"#.*", r"print\s*\("]
-        },
-        "java": {
-            "keywords": ["public class", "public static void main", "System.out.println", "import java", "public static", "private ", "protected "],
-            "patterns": [r"public\s+class\s+\w+", r"System\.out\.println", r"public\s+static\s+void\s+main"]
-        },
-        "cpp": {
-            "keywords": ["#include <", "std::", "cout <<", "cin >>", "namespace std", "using namespace", "int main()"],
-            "patterns": [r"#include\s*<\w+>", r"std::\w+", r"cout\s*<<", r"cin\s*>>", r"using\s+namespace\s+std"]
-        },
-        "c": {
-            "keywords": ["#include <stdio.h>", "#include <stdlib.h>", "printf(", "scanf(", "int main()", "void main()"],
-            "patterns": [r"#include\s*<\w+\.h>", r"printf\s*\(", r"scanf\s*\(", r"int\s+main\s*\(\s*\)"]
-        },
-        "js": {
-            "keywords": ["function ", "var ", "let ", "const ", "console.log", "document.", "window.", "=> "],
-            "patterns": [r"function\s+\w+\s*\(", r"console\.log\s*\(", r"document\.\w+", r"=>\s*", r"var\s+\w+\s*="]
-        },
-        "ts": {
-            "keywords": ["interface ", "type ", ": string", ": number", ": boolean", "export ", "import {"],
-            "patterns": [r"interface\s+\w+", r":\s*(string|number|boolean)", r"export\s+(interface|type|class)"]
-        },
-        "go": {
-            "keywords": ["package main", "func main()", "import (", "fmt.Println", "var ", "func "],
-            "patterns": [r"package\s+main", r"func\s+main\s*\(\s*\)", r"fmt\.Println", r"func\s+\w+\s*\("]
-        },
-        "r": {
-            "keywords": ["library(", "<- ", "print(", "cat(", "data.frame(", "c("],
-            "patterns": [r"library\s*\(", r"\w+\s*<-", r"data\.frame\s*\(", r"\bc\s*\("]
-        },
-        "matlab": {
-            "keywords": ["function ", "end", "fprintf(", "disp(", "plot(", "clear all"],
-            "patterns": [r"function\s+\w+", r"fprintf\s*\(", r"disp\s*\(", r"clear\s+all"]
-        },
-        "shell": {
-            "keywords": ["#!/bin/bash", "#!/bin/sh", "echo ", "if [", "for ", "while "],
-            "patterns": [r"#!/bin/(bash|sh)", r"echo\s+", r"if\s*\[", r"\$\w+"]
-        },
-        "sql": {
-            "keywords": ["SELECT ", "FROM ", "WHERE ", "INSERT INTO", "UPDATE ", "DELETE FROM", "CREATE TABLE"],
-            "patterns": [r"SELECT\s+.*\s+FROM", r"INSERT\s+INTO", r"CREATE\s+TABLE", r"UPDATE\s+\w+\s+SET"]
-        },
-        "html": {
-            "keywords": ["<html>", "<head>", "<body>", "<div>", "<!DOCTYPE", "<script>"],
-            "patterns": [r"<!DOCTYPE\s+html>", r"<(html|head|body|div|script)", r"</\w+>"]
-        },
-        "css": {
-            "keywords": ["{", "}", "color:", "background:", "margin:", "padding:"],
-            "patterns": [r"\w+\s*\{[^}]*\}", r"(color|background|margin|padding)\s*:", r"#[0-9a-fA-F]{3,6}"]
-        }
-    }
+    sample = text_clean[:_SAMPLE_SIZE]
+    return _detect(sample)
+
+
+def languagecheck_batch(texts: list[str]) -> list[str]:
+    """
+    Detect the programming language of many code texts at once.
     
-    # Score each language based on keyword and pattern matches
-    language_scores: dict[str, int] = {}
+    Each distinct sample in the batch is classified once, however many times
+    it repeats and however large the batch is compared to the result cache.
     
-    for lang, rules in language_patterns.items():
-        score = 0
+    Args:
+        texts (list[str]): The code texts to analyze.
         
-        # Check keywords
-        for keyword in rules["keywords"]:
-            if keyword.lower() in text_lower:
-                score += 2
+    Returns:
+        list[str]: The detected language code for each text, in input order
+                   (same codes as languagecheck).
+    """
+    detected: dict[str, str] = {}
+    results: list[str] = []
+    for text in texts:
+        text_clean = text.strip() if text else ""
+        if not text_clean:
+            results.append("unknown")
+            continue
         
-        # Check patterns
-        for pattern in rules["patterns"]:
-            matches = re.findall(pattern, text_clean, re.IGNORECASE | re.MULTILINE)
-            score += len(matches)
-    
-        if score > 0:
-            language_scores[lang] = score
-    
-    # Special cases and additional heuristics
-    
-    # C++ vs C disambiguation
-    if "cpp" in language_scores and "c" in language_scores:
-        if any(keyword in text_lower for keyword in ["std::", "cout", "cin", "namespace", "using namespace"]):
-            language_scores["cpp"] += 3
-        else:
-            language_scores["c"] += 1
-    
-    # JavaScript vs TypeScript disambiguation
-    if "js" in language_scores and "ts" in language_scores:
-        if any(keyword in text_lower for keyword in ["interface", "type ", ": string", ": number", ": boolean"]):
-            language_scores["ts"] += 3
-        else:
-            language_scores["js"] += 1
-    
-    # Return the language with the highest score
-    if language_scores:
-        return max(language_scores.keys(), key=lambda x: language_scores[x])
-    
-    return "unknown"
-
+        sample = text_clean[:_SAMPLE_SIZE]
+        lang = detected.get(sample)
+        if lang is None:
+            lang = detected[sample] = _detect(sample)
+        results.append(lang)
+    return results
 
 
 def get_supported_languages() -> list[str]:
@@ -1,9 +1,18 @@
 import ast
 import re
-import json
 import os
+import sys
 import glob
-from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+if __package__:
+    from ..jsonio import load_json, dump_json
+else:  # run as a script (python ucheck/rank/weightrank.py), so import from the project root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from ucheck.jsonio import load_json, dump_json
 
 # --------------------------
 # Global heuristic weights (raw, will be normalized later)
@@ -22,9 +31,36 @@ DOCUMENTATION_FACTOR = 0.1
 # Default threshold for utility classification
 DEFAULT_THRESHOLD = 0.8
 
+# Patterns used on every scored function, compiled once
+_IMPORT_RE = re.compile(r"^\s*(import|from)\s+.*", re.MULTILINE)
+_RE_USAGE_RE = re.compile(r"\bre\.")
+# Start of a line with something other than whitespace on it
+_NONBLANK_LINE_RE = re.compile(r"^[^\S\n]*\S", re.MULTILINE)
+
+# 'util' (which covers 'utils' and 'utility') within a path component, before
+# the component's first '.' so file extensions are ignored
+_UTIL_PATH_RE = re.compile(r"(?:^|[\\/])[^\\/.]*util")
+
+# Substrings of a lowercased function name that nudge its score up or down
+_UTILITY_NAME_RE = re.compile("util|helper|get|set|convert|format")
+_CORE_NAME_RE = re.compile("main|init|process|analyze|complex")
+
 # --------------------------
 # Helpers
 # --------------------------
+def _find_project_root() -> str:
+    """Find the project root (where setup.py or README.md exists)."""
+    project_root = os.path.dirname(os.path.abspath(__file__))
+    while project_root != os.path.dirname(project_root):
+        if (os.path.exists(os.path.join(project_root, 'setup.py')) or 
+            os.path.exists(os.path.join(project_root, 'README.md'))):
+            break
+        project_root = os.path.dirname(project_root)
+    return project_root
+
+# Relative data/output directories resolve against this, found once at import
+_PROJECT_ROOT = _find_project_root()
+
 def is_utility_file_or_folder(file_path: str) -> bool:
     """
     Check if the function is from a utility file or folder.
@@ -34,28 +70,7 @@ def is_utility_file_or_folder(file_path: str) -> bool:
         return False
     
     # Convert to lowercase for case-insensitive matching
-    path_lower = file_path.lower()
-    
-    # Split the path by common separators to check each component
-    path_components = path_lower.replace('\\', '/').split('/')
-    
-    # Check if any component contains utility-related names
-    utility_names = ['util', 'utils', 'utility']
-    
-    for component in path_components:
-        # Remove file extensions for checking
-        component_base = component.split('.')[0]
-        
-        # Check if the component is exactly one of the utility names
-        if component_base in utility_names:
-            return True
-        
-        # Check if the component contains utility names as substrings
-        for util_name in utility_names:
-            if util_name in component_base:
-                return True
-    
-    return False
+    return _UTIL_PATH_RE.search(file_path.lower()) is not None
 
 def is_trivial_return(node: ast.Return) -> bool:
     if isinstance(node.value, (ast.Constant, ast.Name)):
@@ -64,45 +79,127 @@ def is_trivial_return(node: ast.Return) -> bool:
         return node.value.value.id == "self"
     return False
 
-def count_objects_and_calls(tree: ast.AST) -> Dict[str, int]:
+# Field names per AST node class, looked up once per class instead of per node
+_FIELDS_CACHE: Dict[type, Tuple[str, ...]] = {}
+
+def _iter_all(root: ast.AST) -> List[ast.AST]:
+    """Return every node under root in ast.walk order, without walk's per-node generators."""
+    nodes = [root]
+    # The list grows while it is iterated, which visits nodes breadth-first
+    for node in nodes:
+        node_type = type(node)
+        fields = _FIELDS_CACHE.get(node_type)
+        if fields is None:
+            fields = _FIELDS_CACHE[node_type] = node_type._fields
+        for field in fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                nodes.extend([item for item in value if isinstance(item, ast.AST)])
+            elif isinstance(value, ast.AST):
+                nodes.append(value)
+    return nodes
+
+# Node kinds the analysis reacts to; every other node type is skipped after
+# one dict lookup instead of a chain of type checks
+_CALL, _ASSIGN, _CONTROL, _RETURN, _FUNCTION = range(5)
+_NODE_KINDS: Dict[type, int] = {
+    ast.Call: _CALL,
+    ast.Assign: _ASSIGN,
+    ast.For: _CONTROL,
+    ast.While: _CONTROL,
+    ast.If: _CONTROL,
+    ast.Try: _CONTROL,
+    ast.With: _CONTROL,
+    ast.Return: _RETURN,
+    ast.FunctionDef: _FUNCTION,
+}
+
+class AnalysisResult(NamedTuple):
+    """Everything scoring needs from a parsed function."""
+    return_count: int
+    last_return: Optional[ast.Return]
+    object_inits: int
+    func_calls: int
+    control_structures: int
+    complexity: int
+    max_nesting: int
+    statement_count: int
+
+def _analyze_tree(tree: ast.AST) -> AnalysisResult:
+    """
+    Collect everything scoring needs from a parsed function in one walk.
+    
+    Nesting is tracked in ast.walk order, as the complexity score always was.
+    """
+    # Scoring only asks whether there is exactly one return, so keep a count
+    # and the last one seen rather than collecting them all
+    return_count = 0
+    last_return: Optional[ast.Return] = None
     object_inits = 0
     func_calls = 0
     control_structures = 0
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Call):
+    max_nesting = 0
+    current_nesting = 0
+    # Parsed trees never contain AST subclasses, so exact type lookups are safe
+    for node in _iter_all(tree):
+        kind = _NODE_KINDS.get(type(node))
+        if kind is None:
+            continue
+        if kind == _CALL:
             func_calls += 1
-        elif isinstance(node, ast.Assign):
-            if isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name):
+        elif kind == _ASSIGN:
+            if type(node.value) is ast.Call and type(node.value.func) is ast.Name:
                 object_inits += 1
-        elif isinstance(node, (ast.For, ast.While, ast.If, ast.Try, ast.With)):
+        elif kind == _CONTROL:
             control_structures += 1
-    return {"object_inits": object_inits, "func_calls": func_calls, "control_structures": control_structures}
+            current_nesting += 1
+            max_nesting = max(max_nesting, current_nesting)
+        elif kind == _RETURN:
+            return_count += 1
+            last_return = node
+        else:
+            current_nesting = max(0, current_nesting - 1)
+    # Top-level statements other than pass and bare expressions
+    statement_count = sum(1 for n in getattr(tree, "body", ()) if not isinstance(n, (ast.Pass, ast.Expr)))
+    return AnalysisResult(
+        return_count=return_count,
+        last_return=last_return,
+        object_inits=object_inits,
+        func_calls=func_calls,
+        control_structures=control_structures,
+        # Base complexity of 1 plus one per control structure
+        complexity=1 + control_structures,
+        max_nesting=max_nesting,
+        statement_count=statement_count,
+    )
+
+def count_objects_and_calls(tree: ast.AST) -> Dict[str, int]:
+    analysis = _analyze_tree(tree)
+    return {
+        "object_inits": analysis.object_inits,
+        "func_calls": analysis.func_calls,
+        "control_structures": analysis.control_structures,
+    }
 
 def count_import_words(code: str) -> int:
-    imports = re.findall(r"^\s*(import|from)\s+.*", code, re.MULTILINE)
+    imports = _IMPORT_RE.findall(code)
     return sum(len(i.split()) for i in imports)
 
 def count_regex_usage(code: str) -> int:
-    return len(re.findall(r"\bre\.", code))
+    return sum(1 for _ in _RE_USAGE_RE.finditer(code))
+
+def _complexity_score(analysis: AnalysisResult) -> float:
+    # Normalize complexity (higher complexity = more utility-like)
+    return min(1.0, (analysis.complexity + analysis.max_nesting * 0.5) / 10.0)
+
+def calculate_code_complexity_tree(tree: ast.AST) -> float:
+    """Calculate code complexity of an already parsed tree."""
+    return _complexity_score(_analyze_tree(tree))
 
 def calculate_code_complexity(code: str) -> float:
     """Calculate code complexity based on cyclomatic complexity and nesting."""
     try:
-        tree = ast.parse(code)
-        complexity = 1  # Base complexity
-        max_nesting = 0
-        current_nesting = 0
-        
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.If, ast.For, ast.While, ast.Try, ast.With)):
-                complexity += 1
-                current_nesting += 1
-                max_nesting = max(max_nesting, current_nesting)
-            elif isinstance(node, ast.FunctionDef):
-                current_nesting = max(0, current_nesting - 1)
-        
-        # Normalize complexity (higher complexity = more utility-like)
-        return min(1.0, (complexity + max_nesting * 0.5) / 10.0)
+        return calculate_code_complexity_tree(ast.parse(code))
     except:
         return 0.0
 
@@ -111,8 +208,8 @@ def calculate_documentation_ratio(original_code: str, cleaned_code: str) -> floa
     if not original_code.strip():
         return 0.0
     
-    original_lines = len([line for line in original_code.split('\n') if line.strip()])
-    cleaned_lines = len([line for line in cleaned_code.split('\n') if line.strip()])
+    original_lines = len(_NONBLANK_LINE_RE.findall(original_code))
+    cleaned_lines = len(_NONBLANK_LINE_RE.findall(cleaned_code))
     
     if original_lines == 0:
         return 0.0
@@ -120,31 +217,29 @@ def calculate_documentation_ratio(original_code: str, cleaned_code: str) -> floa
     doc_ratio = 1.0 - (cleaned_lines / original_lines)
     return max(0.0, min(1.0, doc_ratio))
 
-# --------------------------
-# Main function scoring
-# --------------------------
-def score_function(node: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD, original_code: str = "") -> Dict[str, Any]:
-    """Score a function and determine if it's a utility function."""
-    code = node.get("code", "")
-    if code is None:
-        code = ""
-    lines = code.strip().count("\n") + 1
+def _finalize_score(total_score: float, label: str) -> float:
+    """Map summed heuristic points to 0-1 and apply the function-name nudges."""
+    # Map to 0-1 using a more reasonable approach
+    # Expected range is roughly -1 to +1, so we'll map that to 0-1
+    normalized_score = (total_score + 1.0) / 2.0
+    normalized_score = max(0.0, min(1.0, normalized_score))
+
+    # Add some randomness/variance based on function name patterns
+    function_name = label.lower()
+    if _UTILITY_NAME_RE.search(function_name):
+        normalized_score += 0.1
+    if _CORE_NAME_RE.search(function_name):
+        normalized_score -= 0.1
     
-    # ----------------------
-    # Check for utility file/folder - bypass heuristics if found
-    # ----------------------
-    function_id = node.get("id", "")
-    if is_utility_file_or_folder(function_id):
-        # Auto-assign utility score of 1.0 for functions in util/utils/utility files/folders
-        node["rank"] = 1.0
-        node["isUtil"] = True
-        node["category"] = "utility"
-        return node
+    return max(0.0, min(1.0, normalized_score))
 
-    # ----------------------
-    # Raw heuristic points (weighted scoring)
-    # ----------------------
+# Code points are a pure function of the code string, so repeated strings (such
+# as re-ranking with another threshold) reuse earlier results
+@lru_cache(maxsize=4096)
+def _code_points(code: str) -> Tuple[float, ...]:
+    """Heuristic points that depend only on the function's code."""
     raw_points: List[float] = []
+    lines = code.strip().count("\n") + 1
 
     # Simple functions (few lines = potentially more utility-like, but not guaranteed)
     if lines <= 3:
@@ -154,50 +249,47 @@ def score_function(node: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD, o
     else:
         raw_points.append(-0.1)  # Complex functions less likely to be utilities
 
-    # AST-based analysis
+    # AST-based analysis: parse once and gather every count in a single walk
     try:
         tree = ast.parse(code)
+        counts = _analyze_tree(tree)
         
         # Trivial return check (simple getters/setters)
-        returns = [n for n in ast.walk(tree) if isinstance(n, ast.Return)]
-        if len(returns) == 1 and is_trivial_return(returns[0]):
+        if counts.return_count == 1 and is_trivial_return(counts.last_return):
             raw_points.append(0.2)  # Reduced from 0.8
         else:
             raw_points.append(0.0)
 
         # Single statement functions
-        statements = [n for n in tree.body if not isinstance(n, (ast.Pass, ast.Expr))]
-        if len(statements) <= 1:
+        if counts.statement_count <= 1:
             raw_points.append(0.2)  # Simple functions
         else:
             raw_points.append(0.0)
 
-        counts = count_objects_and_calls(tree)
-        
         # Control structures (loops, conditionals) - mixed signal
-        if counts["control_structures"] > 3:
+        if counts.control_structures > 3:
             raw_points.append(-0.2)  # Too complex for typical utilities
-        elif counts["control_structures"] > 0:
+        elif counts.control_structures > 0:
             raw_points.append(0.1)   # Some complexity is ok
         else:
             raw_points.append(0.0)   # No control structures
 
         # Function calls - utilities often call other functions
-        if counts["func_calls"] > 5:
+        if counts.func_calls > 5:
             raw_points.append(-0.1)  # Too many calls = complex
-        elif counts["func_calls"] > 0:
+        elif counts.func_calls > 0:
             raw_points.append(0.2)   # Some calls = good
         else:
             raw_points.append(-0.1)  # No calls = might be too simple
 
         # Object initializations
-        if counts["object_inits"] > 2:
+        if counts.object_inits > 2:
             raw_points.append(-0.1)  # Too many objects = complex
         else:
             raw_points.append(0.0)
 
         # Code complexity
-        complexity_score = calculate_code_complexity(code)
+        complexity_score = _complexity_score(counts)
         if complexity_score > 0.5:
             raw_points.append(-0.2)  # High complexity = less utility-like
         else:
@@ -222,6 +314,35 @@ def score_function(node: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD, o
     else:
         raw_points.append(0.0)
 
+    return tuple(raw_points)
+
+# --------------------------
+# Main function scoring
+# --------------------------
+def _rank_function(node: Dict[str, Any], threshold: float, original_code: str = "") -> Tuple[float, bool, str]:
+    """
+    Score a function node without modifying it.
+    
+    Returns the rank, the utility flag and the legacy category, so callers
+    that aggregate scores use these directly instead of reading them back
+    out of the node.
+    """
+    code = node.get("code", "")
+    if code is None:
+        code = ""
+    
+    # ----------------------
+    # Check for utility file/folder - bypass heuristics if found
+    # ----------------------
+    if is_utility_file_or_folder(node.get("id", "")):
+        # Auto-assign utility score of 1.0 for functions in util/utils/utility files/folders
+        return 1.0, True, "utility"
+
+    # ----------------------
+    # Raw heuristic points (weighted scoring)
+    # ----------------------
+    raw_points = list(_code_points(code))
+
     # Documentation ratio (this needs original code to work)
     if original_code:
         doc_ratio = calculate_documentation_ratio(original_code, code)
@@ -232,58 +353,100 @@ def score_function(node: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD, o
     # ----------------------
     # Proper normalization to 0–1
     # ----------------------
-    # Convert to 0-1 scale using sigmoid-like function
-    total_score = sum(raw_points)
-    
-    # Map to 0-1 using a more reasonable approach
-    # Expected range is roughly -1 to +1, so we'll map that to 0-1
-    normalized_score = (total_score + 1.0) / 2.0
-    normalized_score = max(0.0, min(1.0, normalized_score))
-
-    # Add some randomness/variance based on function name patterns
-    function_name = node.get("label", "").lower()
-    if any(word in function_name for word in ["util", "helper", "get", "set", "convert", "format"]):
-        normalized_score += 0.1
-    if any(word in function_name for word in ["main", "init", "process", "analyze", "complex"]):
-        normalized_score -= 0.1
-    
-    normalized_score = max(0.0, min(1.0, normalized_score))
+    normalized_score = _finalize_score(sum(raw_points), node.get("label", ""))
 
-    # Assign final score and utility classification
-    node["rank"] = round(normalized_score, 3)
-    node["isUtil"] = normalized_score >= threshold
-    
     # Keep legacy category for compatibility
     if normalized_score >= 0.7:
-        node["category"] = "utility"
+        category = "utility"
     elif normalized_score <= 0.4:
-        node["category"] = "core"
+        category = "core"
     else:
-        node["category"] = "mixed"
+        category = "mixed"
+
+    # Final score and utility classification
+    return round(normalized_score, 3), normalized_score >= threshold, category
 
+def score_function(node: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD, original_code: str = "") -> Dict[str, Any]:
+    """Score a function and determine if it's a utility function."""
+    node["rank"], node["isUtil"], node["category"] = _rank_function(node, threshold, original_code)
     return node
 
 # --------------------------
 # Apply to all functions
 # --------------------------
+def _score_nodes(graph_nodes: List[Dict[str, Any]], threshold: float) -> Tuple[int, float]:
+    """Score nodes in place, returning the utility count and the sum of ranks."""
+    utility_functions = 0
+    rank_sum = 0
+    for node in graph_nodes:
+        rank, is_util, category = _rank_function(node, threshold)
+        node["rank"] = rank
+        node["isUtil"] = is_util
+        node["category"] = category
+        if is_util:
+            utility_functions += 1
+        rank_sum += rank
+    return utility_functions, rank_sum
+
 def score_all_functions(graph_nodes: List[Dict[str, Any]], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
     """Score all functions in the graph nodes list."""
-    for node in graph_nodes:
-        score_function(node, threshold)
+    _score_nodes(graph_nodes, threshold)
     return graph_nodes
 
+def _process_one_file(json_file: str, output_file: str, threshold: float) -> Dict[str, Any]:
+    """
+    Rank one JSON file and write its ranked version.
+    
+    Runs in a worker process, so it reports a small summary back instead of
+    printing or returning the nodes.
+    """
+    try:
+        # Read the original JSON file
+        data = load_json(json_file)
+        
+        # Extract graph nodes
+        graph_nodes = data.get("analysisData", {}).get("graphNodes", [])
+        
+        if not graph_nodes:
+            return {"status": "empty", "input_file": json_file}
+        
+        # Score all functions (nodes are scored in place, so no copy is needed),
+        # totalling the summary figures on the way
+        ranked_nodes = graph_nodes
+        utility_functions, rank_sum = _score_nodes(ranked_nodes, threshold)
+        
+        # Create output data structure
+        ranked_data: Dict[str, Any] = {
+            "analysisData": {
+                "graphNodes": ranked_nodes
+            },
+            "rankingInfo": {
+                "threshold": threshold,
+                "totalFunctions": len(ranked_nodes),
+                "utilityFunctions": utility_functions,
+                "averageRank": rank_sum / len(ranked_nodes),
+                "processedAt": "2025-10-06"  # Current date
+            }
+        }
+        
+        # Save ranked file
+        dump_json(ranked_data, output_file)
+        
+        return {
+            "status": "success",
+            "input_file": json_file,
+            "output_file": output_file,
+            "total_functions": len(ranked_nodes),
+            "utility_functions": utility_functions
+        }
+        
+    except Exception as e:
+        return {"status": "error", "input_file": json_file, "message": str(e)}
+
 def process_data_files(data_dir: str = "data", threshold: float = DEFAULT_THRESHOLD) -> Dict[str, Any]:
     """Process all JSON files in the data directory and create ranked versions."""
     if not os.path.isabs(data_dir):
-        # Find the project root (where setup.py or README.md exists)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = current_dir
-        while project_root != os.path.dirname(project_root):
-            if (os.path.exists(os.path.join(project_root, 'setup.py')) or 
-                os.path.exists(os.path.join(project_root, 'README.md'))):
-                break
-            project_root = os.path.dirname(project_root)
-        data_dir = os.path.join(project_root, data_dir)
+        data_dir = os.path.join(_PROJECT_ROOT, data_dir)
     
     if not os.path.exists(data_dir):
         raise FileNotFoundError(f"Data directory does not exist: {data_dir}")
@@ -298,6 +461,8 @@ def process_data_files(data_dir: str = "data", threshold: float = DEFAULT_THRESH
         "threshold_used": threshold
     }
     
+    input_files: List[str] = []
+    output_files: List[str] = []
     for json_file in json_files:
         # Extract base name (without extension)
         base_name = os.path.splitext(os.path.basename(json_file))[0]
@@ -306,55 +471,39 @@ def process_data_files(data_dir: str = "data", threshold: float = DEFAULT_THRESH
         if base_name.endswith("_rank"):
             continue
         
-        try:
-            # Read the original JSON file
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Extract graph nodes
-            graph_nodes = data.get("analysisData", {}).get("graphNodes", [])
-            
-            if not graph_nodes:
-                print(f"No graph nodes found in {json_file}")
-                continue
-            
-            # Score all functions
-            ranked_nodes = score_all_functions(graph_nodes.copy(), threshold)
-            
-            # Create output data structure
-            ranked_data: Dict[str, Any] = {
-                "analysisData": {
-                    "graphNodes": ranked_nodes
-                },
-                "rankingInfo": {
-                    "threshold": threshold,
-                    "totalFunctions": len(ranked_nodes),
-                    "utilityFunctions": sum(1 for node in ranked_nodes if node.get("isUtil", False)),
-                    "averageRank": sum(node.get("rank", 0) for node in ranked_nodes) / len(ranked_nodes) if ranked_nodes else 0,
-                    "processedAt": "2025-10-06"  # Current date
-                }
-            }
-            
-            # Save ranked file
-            output_file = os.path.join(data_dir, f"{base_name}_rank.json")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(ranked_data, f, indent=2)
-            
-            # Update results
-            results["processed_files"].append({
-                "input_file": json_file,
-                "output_file": output_file,
-                "total_functions": len(ranked_nodes),
-                "utility_functions": sum(1 for node in ranked_nodes if node.get("isUtil", False))
-            })
-            results["total_functions"] += len(ranked_nodes)
-            results["utility_functions"] += sum(1 for node in ranked_nodes if node.get("isUtil", False))
-            
-            print(f"Processed {json_file} -> {output_file}")
-            print(f"  Functions: {len(ranked_nodes)}, Utility: {sum(1 for node in ranked_nodes if node.get('isUtil', False))}")
-            
-        except Exception as e:
-            print(f"Error processing {json_file}: {e}")
+        input_files.append(json_file)
+        output_files.append(os.path.join(data_dir, f"{base_name}_rank.json"))
+    
+    # Files are independent and scoring is CPU-bound, so rank them in worker
+    # processes; a single file is not worth the pool start-up
+    if len(input_files) > 1:
+        with ProcessPoolExecutor() as executor:
+            file_results = list(executor.map(_process_one_file, input_files, output_files, repeat(threshold)))
+    else:
+        file_results = [_process_one_file(json_file, output_file, threshold)
+                        for json_file, output_file in zip(input_files, output_files)]
+    
+    for result in file_results:
+        json_file = result["input_file"]
+        if result["status"] == "empty":
+            print(f"No graph nodes found in {json_file}")
+            continue
+        if result["status"] == "error":
+            print(f"Error processing {json_file}: {result['message']}")
+            continue
+        
+        # Update results
+        results["processed_files"].append({
+            "input_file": json_file,
+            "output_file": result["output_file"],
+            "total_functions": result["total_functions"],
+            "utility_functions": result["utility_functions"]
+        })
+        results["total_functions"] += result["total_functions"]
+        results["utility_functions"] += result["utility_functions"]
+        
+        print(f"Processed {json_file} -> {result['output_file']}")
+        print(f"  Functions: {result['total_functions']}, Utility: {result['utility_functions']}")
     
     return results
 
@@ -1,8 +1,18 @@
 import os
+import io
+import re
 import ast
-import json
-from typing import Dict, List, Any
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Any, Optional, Tuple
 from ..languagecheck.detector import languagecheck
+from ..jsonio import dump_json
+from ..rank.weightrank import _PROJECT_ROOT
+
+# Scans a line as plain text, string literals (possibly unterminated, running
+# to the end of the line) and a trailing comment
+_STRING_OR_COMMENT = re.compile(r"""[^'"#]+|'(?:[^'\\]|\\.)*'?|"(?:[^"\\]|\\.)*"?|#.*""")
 
 
 class FunctionExtractor:
@@ -15,106 +25,100 @@ class FunctionExtractor:
     def _clean_code(self, code: str) -> str:
         """Remove comments and docstrings from Python code."""
         try:
-            # Parse the code into an AST
-            tree = ast.parse(code)
-            
-            # Convert back to source code without comments and docstrings
-            lines = code.split('\n')
-            cleaned_lines: List[str] = []
-            
-            for line in lines:
-                # Remove inline comments (but preserve strings with #)
-                cleaned_line = self._remove_inline_comments(line)
-                
-                # Skip empty lines that result from comment removal
-                if cleaned_line.strip():
-                    cleaned_lines.append(cleaned_line)
-            
-            # Parse again to remove docstrings
-            cleaned_code = '\n'.join(cleaned_lines)
-            if cleaned_code.strip():
-                tree = ast.parse(cleaned_code)
-                return self._remove_docstrings_from_ast(tree, cleaned_code)
-            
-            return cleaned_code
-            
-        except:
-            # If parsing fails, do basic comment removal
+            tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+        except (tokenize.TokenError, SyntaxError):
+            # If tokenizing fails, do basic comment removal
             return self._basic_comment_removal(code)
-    
-    def _remove_inline_comments(self, line: str) -> str:
-        """Remove inline comments while preserving # in strings."""
-        in_string = False
-        string_char = None
-        escaped = False
-        result: List[str] = []
         
-        i = 0
-        while i < len(line):
-            char = line[i]
-            
-            if escaped:
-                result.append(char)
-                escaped = False
-            elif char == '\\' and in_string:
-                result.append(char)
-                escaped = True
-            elif char in ['"', "'"] and not in_string:
-                in_string = True
-                string_char = char
-                result.append(char)
-            elif char == string_char and in_string:
-                in_string = False
-                string_char = None
-                result.append(char)
-            elif char == '#' and not in_string:
-                # Found a comment, stop here
-                break
-            else:
-                result.append(char)
-            
-            i += 1
+        # Cut comments and docstrings out of the source by token position;
+        # untokenize would re-join the remaining lines with backslashes
+        lines = code.split('\n')
+        # Apply removals from the last position to the first, so a multi-line
+        # removal never shifts the rows of one still to be applied
+        spans = sorted(self._comment_and_docstring_spans(tokens), reverse=True)
+        for (start_row, start_col), (end_row, end_col) in spans:
+            lines[start_row - 1:end_row] = [lines[start_row - 1][:start_col] + lines[end_row - 1][end_col:]]
         
-        return ''.join(result).rstrip()
+        # Skip empty lines that result from the removal
+        cleaned_lines = [line.rstrip() for line in lines if line.strip()]
+        return '\n'.join(cleaned_lines)
     
-    def _remove_docstrings_from_ast(self, tree: ast.Module, code: str) -> str:
-        """Remove docstrings from AST and return cleaned code."""
-        lines = code.split('\n')
-        lines_to_remove: set[int] = set()
+    def _comment_and_docstring_spans(self, tokens: List[tokenize.TokenInfo]) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """
+        Find comment tokens and docstrings in a single pass over the tokens.
         
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
-                if (node.body and 
-                    isinstance(node.body[0], ast.Expr) and 
-                    isinstance(node.body[0].value, ast.Constant) and 
-                    isinstance(node.body[0].value.value, str)):
-                    
-                    # This is a docstring, mark lines for removal
-                    docstring_node = node.body[0]
-                    start_line = docstring_node.lineno - 1
-                    end_line = getattr(docstring_node, 'end_lineno', start_line + 1) - 1
-                    
-                    for line_num in range(start_line, end_line + 1):
-                        if line_num < len(lines):
-                            lines_to_remove.add(line_num)
+        A docstring is a logical line made only of plain string literals that
+        opens a module, class or function body, or the string literals after
+        the colon of a one-line def/class. Spans come out of order, since a
+        docstring is only known once its logical line ends.
+        """
+        spans: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+        line_tokens: List[tokenize.TokenInfo] = []
+        first_in_body = True  # The module body starts here
+        body_pending = False
         
-        # Also check for module-level docstrings
-        if (tree.body and 
-            isinstance(tree.body[0], ast.Expr) and 
-            isinstance(tree.body[0].value, ast.Constant) and 
-            isinstance(tree.body[0].value.value, str)):
-            
-            docstring_node = tree.body[0]
-            start_line = docstring_node.lineno - 1
-            end_line = getattr(docstring_node, 'end_lineno', start_line + 1) - 1
-            
-            for line_num in range(start_line, end_line + 1):
-                if line_num < len(lines):
-                    lines_to_remove.add(line_num)
+        for token in tokens:
+            if token.type == tokenize.COMMENT:
+                spans.append((token.start, token.end))
+            elif token.type == tokenize.INDENT:
+                first_in_body = body_pending
+                body_pending = False
+            elif token.type == tokenize.DEDENT:
+                first_in_body = False
+            elif token.type == tokenize.NEWLINE:
+                header_end = self._definition_header_end(line_tokens)
+                body_tokens = line_tokens if first_in_body else []
+                if header_end is not None:
+                    # A body on the header's own line starts after the colon
+                    body_tokens = line_tokens[header_end + 1:]
+                if body_tokens and all(self._is_plain_string(t) for t in body_tokens):
+                    spans.append((body_tokens[0].start, body_tokens[-1].end))
+                body_pending = header_end == len(line_tokens) - 1
+                first_in_body = False
+                line_tokens = []
+            elif token.type not in (tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER):
+                line_tokens.append(token)
         
-        # Filter out the docstring lines
-        cleaned_lines = [line for i, line in enumerate(lines) if i not in lines_to_remove]
-        return '\n'.join(cleaned_lines)
+        return spans
+    
+    def _is_plain_string(self, token: tokenize.TokenInfo) -> bool:
+        """Check for a str literal token (not bytes or an f-string)."""
+        if token.type != tokenize.STRING:
+            return False
+        # The prefix is everything before the first quote character
+        prefix = token.string.split(token.string[-1], 1)[0].lower()
+        return 'b' not in prefix and 'f' not in prefix
+    
+    def _definition_header_end(self, line_tokens: List[tokenize.TokenInfo]) -> Optional[int]:
+        """Return the index of the colon ending a def/class header, or None for other lines."""
+        if not line_tokens or line_tokens[0].type != tokenize.NAME:
+            return None
+        first = line_tokens[0].string
+        if first == 'async' and len(line_tokens) > 1:
+            first = line_tokens[1].string
+        if first not in ('def', 'class'):
+            return None
+        
+        # Colons inside brackets belong to annotations, lambdas or slices
+        depth = 0
+        for index, token in enumerate(line_tokens):
+            if token.type != tokenize.OP:
+                continue
+            if token.string in '([{':
+                depth += 1
+            elif token.string in ')]}':
+                depth -= 1
+            elif token.string == ':' and depth == 0:
+                return index
+        return None
+    
+    def _remove_inline_comments(self, line: str) -> str:
+        """Remove inline comments while preserving # in strings."""
+        for match in _STRING_OR_COMMENT.finditer(line):
+            if match.group().startswith('#'):
+                # Found a comment, stop here
+                return line[:match.start()].rstrip()
+        return line.rstrip()
     
     def _basic_comment_removal(self, code: str) -> str:
         """Basic comment and docstring removal as fallback."""
@@ -155,6 +159,7 @@ class FunctionExtractor:
         
         try:
             tree = ast.parse(content)
+            lines = content.split('\n')
             
             # Only process top-level nodes to avoid duplicates
             for node in tree.body:
@@ -164,7 +169,6 @@ class FunctionExtractor:
                     func_end = getattr(node, 'end_lineno', func_start)
                     
                     # Get the function code
-                    lines = content.split('\n')
                     func_lines = lines[func_start-1:func_end]
                     func_code = '\n'.join(func_lines)
                     
@@ -186,7 +190,6 @@ class FunctionExtractor:
                             func_start = item.lineno
                             func_end = getattr(item, 'end_lineno', func_start)
                             
-                            lines = content.split('\n')
                             func_lines = lines[func_start-1:func_end]
                             func_code = '\n'.join(func_lines)
                             
@@ -212,36 +215,69 @@ class FunctionExtractor:
         """Get relative path from base directory."""
         return os.path.relpath(file_path, base_path).replace('\\', '/')
     
-    def _process_file(self, file_path: str, base_path: str) -> None:
-        """Process a single file and extract functions."""
+    def _extract_file(self, file_path: str, base_path: str) -> List[Dict[str, Any]]:
+        """Extract the functions of a single file."""
         # Skip binary files and cache files
         if (file_path.endswith('.pyc') or 
             file_path.endswith('.pyo') or 
             '__pycache__' in file_path or
             file_path.endswith('.so') or
             file_path.endswith('.dll')):
-            return
+            return []
             
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Check language type
-            language = languagecheck(content)
+            # Check language type, unless the extension already tells
+            language = "py" if file_path.endswith('.py') else languagecheck(content)
             
             if language in self.supported_languages:
                 relative_path = self._get_relative_path(file_path, base_path)
-                functions = self.supported_languages[language](file_path, content, relative_path)
-                self.graph_nodes.extend(functions)
+                return self.supported_languages[language](file_path, content, relative_path)
             
         except Exception as e:
             print(f"Error processing file {file_path}: {e}")
+        
+        return []
+    
+    def _process_file(self, file_path: str, base_path: str) -> None:
+        """Process a single file and extract functions."""
+        self.graph_nodes.extend(self._extract_file(file_path, base_path))
+    
+    def _collect_python_files(self, directory_path: str, file_paths: List[str]) -> None:
+        """Recursively collect Python source files, in directory walk order."""
+        subdirectories: List[str] = []
+        try:
+            with os.scandir(directory_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Like os.walk, don't descend into symlinked directories
+                        if entry.name != '__pycache__' and not entry.is_symlink():
+                            subdirectories.append(entry.path)
+                    elif entry.name.endswith('.py'):
+                        # Only Python is supported, so skip other files unread
+                        file_paths.append(entry.path)
+        except OSError:
+            return
+        
+        for subdirectory in subdirectories:
+            self._collect_python_files(subdirectory, file_paths)
     
     def _walk_directory(self, directory_path: str, base_path: str) -> None:
-        """Recursively walk through directory and process files."""
-        for root, _, files in os.walk(directory_path):
-            for file in files:
-                file_path = os.path.join(root, file)
+        """Recursively walk through directory and process Python source files."""
+        file_paths: List[str] = []
+        self._collect_python_files(directory_path, file_paths)
+        
+        # Files are independent and parsing is CPU-bound, so parse them in
+        # worker processes; a single file is not worth the pool start-up.
+        # Results come back in walk order.
+        if len(file_paths) > 1:
+            with ProcessPoolExecutor() as executor:
+                for functions in executor.map(_parse_file_worker, file_paths, repeat(base_path), chunksize=8):
+                    self.graph_nodes.extend(functions)
+        else:
+            for file_path in file_paths:
                 self._process_file(file_path, base_path)
     
     def performParse(self, path: str, output_dir: str = "data") -> Dict[str, Any]:
@@ -276,15 +312,7 @@ class FunctionExtractor:
         
         # Save to JSON file - use absolute path for data directory
         if not os.path.isabs(output_dir):
-            # Find the project root (where setup.py or README.md exists)
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = current_dir
-            while project_root != os.path.dirname(project_root):
-                if (os.path.exists(os.path.join(project_root, 'setup.py')) or 
-                    os.path.exists(os.path.join(project_root, 'README.md'))):
-                    break
-                project_root = os.path.dirname(project_root)
-            output_dir = os.path.join(project_root, output_dir)
+            output_dir = os.path.join(_PROJECT_ROOT, output_dir)
         
         os.makedirs(output_dir, exist_ok=True)
         
@@ -296,8 +324,7 @@ class FunctionExtractor:
         
         output_file = os.path.join(output_dir, f"{filename}.json")
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(analysis_data, f, indent=2)
+        dump_json(analysis_data, output_file)
         
         print(f"Analysis saved to: {output_file}")
         print(f"Found {len(self.graph_nodes)} functions")
@@ -305,6 +332,11 @@ class FunctionExtractor:
         return analysis_data
 
 
+def _parse_file_worker(file_path: str, base_path: str) -> List[Dict[str, Any]]:
+    """Extract the functions of one file in a worker process."""
+    return FunctionExtractor()._extract_file(file_path, base_path)
+
+
 def parse_code(path: str, output_dir: str = "data") -> Dict[str, Any]:
     """
     Convenience function to parse code and extract functions.